@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+FamilyAI Benchmark Harness
+Open-loop load generator for the gateway and audio services. Reports latency
+percentiles, TTFT, throughput and gateway CPU per request, and stores results
+as JSON so runs can be compared for regressions
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import yaml
+import httpx
+
+from wav import silent_wav
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}'
+)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_VERSION = 1
+
+# Metrics checked by --compare: (path, True if higher is worse)
+REGRESSION_METRICS = [
+    ("latency_ms.p50", True),
+    ("latency_ms.p95", True),
+    ("latency_ms.p99", True),
+    ("ttft_ms.p95", True),
+    ("throughput_rps", False),
+    ("gateway_cpu_ms_per_request", True),
+]
+# /proc CPU time has clock-tick (usually 10 ms) resolution; below this many
+# ticks in a scenario window the rounding alone exceeds the threshold
+MIN_CPU_TICKS = 100
+
+# Statistics
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linearly interpolated percentile (same as numpy's default)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    """p50/p95/p99/mean/max in milliseconds for a list of durations in seconds"""
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+    }
+
+def arrival_times(rate: float, duration: float, arrival: str, rng: random.Random) -> List[float]:
+    """Offsets (seconds) at which requests are sent, independent of completions"""
+    times = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+        if t >= duration:
+            return times
+        times.append(t)
+
+# Request drivers
+def new_sample() -> Dict:
+    return {"ok": False, "latency": None, "ttft": None, "tokens": 0, "items": 1, "error": None}
+
+async def send_chat(client: httpx.AsyncClient, urls: Dict[str, str], scenario: Dict) -> Dict:
+    """Chat completion through the gateway; TTFT is measured on streamed responses"""
+    sample = new_sample()
+    payload = {
+        "model": scenario.get("model", "auto"),
+        "messages": [{"role": "user", "content": scenario.get("prompt", "Hello!")}],
+        "max_tokens": scenario.get("max_tokens"),
+        "stream": scenario.get("stream", False),
+    }
+    start = time.perf_counter()
+
+    async with client.stream("POST", f"{urls['gateway']}/v1/chat/completions", json=payload) as response:
+        if payload["stream"]:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:") or line.strip() == "data: [DONE]":
+                    continue
+                if sample["ttft"] is None:
+                    sample["ttft"] = time.perf_counter() - start
+                sample["tokens"] += 1
+        else:
+            body = await response.aread()
+            if response.status_code < 400:
+                data = json.loads(body)
+                if not isinstance(data, dict):
+                    raise ValueError("non-object JSON response")
+                sample["tokens"] = data.get("usage", {}).get("completion_tokens", 0)
+
+    sample["latency"] = time.perf_counter() - start
+    sample["ok"] = response.status_code < 400
+    if not sample["ok"]:
+        sample["error"] = f"HTTP {response.status_code}"
+    return sample
+
+async def send_batch(client: httpx.AsyncClient, urls: Dict[str, str], scenario: Dict) -> Dict:
+    """Batch of chat completions through /v1/batches; TTFT is the first result line"""
+    sample = new_sample()
+    sample["items"] = scenario.get("batch_size", 10)
+    body = {
+        "model": scenario.get("model", "auto"),
+        "messages": [{"role": "user", "content": scenario.get("prompt", "Hello!")}],
+        "max_tokens": scenario.get("max_tokens"),
+    }
+    lines = "\n".join(
+        json.dumps({"custom_id": str(i), "url": "/v1/chat/completions", "body": body})
+        for i in range(sample["items"])
+    )
+    failed = 0
+    start = time.perf_counter()
+
+    async with client.stream(
+        "POST", f"{urls['gateway']}/v1/batches",
+        content=lines, headers={"Content-Type": "application/x-ndjson"}
+    ) as response:
+        async for line in response.aiter_lines():
+            if not line.strip() or response.status_code >= 400:
+                continue
+            if sample["ttft"] is None:
+                sample["ttft"] = time.perf_counter() - start
+            result = json.loads(line)
+            if result["error"] is not None or result["response"]["status_code"] >= 400:
+                failed += 1
+            elif isinstance(result["response"]["body"], dict):
+                sample["tokens"] += result["response"]["body"].get("usage", {}).get("completion_tokens", 0)
+            else:
+                # The gateway passes non-JSON backend replies through as text
+                failed += 1
+
+    sample["latency"] = time.perf_counter() - start
+    sample["ok"] = response.status_code < 400 and failed == 0
+    if response.status_code >= 400:
+        sample["error"] = f"HTTP {response.status_code}"
+    elif failed:
+        sample["error"] = f"{failed} failed items"
+    return sample
+
+async def send_transcription(client: httpx.AsyncClient, urls: Dict[str, str], scenario: Dict) -> Dict:
+    """Upload a silent WAV of audio_seconds to Whisper"""
+    sample = new_sample()
+    audio = scenario.setdefault("_audio", silent_wav(scenario.get("audio_seconds", 5)))
+    start = time.perf_counter()
+    response = await client.post(
+        f"{urls['whisper']}/v1/audio/transcriptions",
+        files={"file": ("sample.wav", audio, "audio/wav")}
+    )
+    sample["latency"] = time.perf_counter() - start
+    sample["ok"] = response.status_code < 400
+    if not sample["ok"]:
+        sample["error"] = f"HTTP {response.status_code}"
+    return sample
+
+async def send_speech(client: httpx.AsyncClient, urls: Dict[str, str], scenario: Dict) -> Dict:
+    """Synthesize `text` with Piper"""
+    sample = new_sample()
+    start = time.perf_counter()
+    response = await client.post(f"{urls['piper']}/v1/audio/speech", json={"input": scenario.get("text", "Hello!")})
+    sample["latency"] = time.perf_counter() - start
+    sample["ok"] = response.status_code < 400
+    if not sample["ok"]:
+        sample["error"] = f"HTTP {response.status_code}"
+    return sample
+
+TARGETS = {
+    "chat": send_chat,
+    "batch": send_batch,
+    "transcription": send_transcription,
+    "speech": send_speech,
+}
+GATEWAY_TARGETS = ["chat", "batch"]
+
+# Process helpers
+def read_cpu_ticks(pid: int) -> Optional[int]:
+    """User + system CPU time of a process in clock ticks, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15; fields[0] here is field 3
+    return int(fields[11]) + int(fields[12])
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_healthy(url: str, timeout: float = 30.0):
+    """Poll /health until the service answers"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+def start_mock_stack(config_path: str, gateway_log_level: str, log_path: str):
+    """Start mock backends and a gateway wired to them; returns (processes, urls, gateway pid)"""
+    log = open(log_path, "w")
+    ports = {name: free_port() for name in ["vllm", "whisper", "piper", "gateway"]}
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+
+    mocks = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARK_DIR, "mock_backends.py"), "--config", config_path,
+         "--vllm-port", str(ports["vllm"]), "--whisper-port", str(ports["whisper"]),
+         "--piper-port", str(ports["piper"])],
+        stdout=log, stderr=subprocess.STDOUT
+    )
+
+    env = dict(os.environ)
+    for name in ["CODE_TRADITIONAL", "CODE_AGENTIC", "CHAT_ADVANCED", "CHAT_FAST", "CHAT_LIGHT", "VISION", "EMBEDDINGS"]:
+        env[f"{name}_URL"] = urls["vllm"]
+    env.update({
+        "CONFIG_PATH": os.path.join(REPO_DIR, "gateway", "config.yaml"),
+        "WHISPER_URL": urls["whisper"],
+        "PIPER_URL": urls["piper"],
+        "API_AUTH_ENABLED": "",
+        "RATE_LIMIT_REQUESTS_PER_MINUTE": "1000000",
+        "LOG_LEVEL": gateway_log_level.upper(),
+    })
+    gateway = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "router:app", "--host", "127.0.0.1",
+         "--port", str(ports["gateway"]), "--log-level", gateway_log_level.lower()],
+        cwd=os.path.join(REPO_DIR, "gateway"), env=env,
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    return [mocks, gateway], urls, gateway.pid
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Scenario execution
+async def run_scenario(client: httpx.AsyncClient, scenario: Dict, urls: Dict[str, str],
+                       rng: random.Random, gateway_pid: Optional[int]) -> Dict:
+    """Send requests on an open-loop schedule and summarize the samples"""
+    target = scenario["target"]
+    send = TARGETS[target]
+    schedule = arrival_times(scenario["rate"], scenario["duration"], scenario.get("arrival", "poisson"), rng)
+    loop = asyncio.get_running_loop()
+
+    async def timed(offset: float) -> Dict:
+        try:
+            sample = await send(client, urls, scenario)
+        except (httpx.HTTPError, ValueError, AttributeError, KeyError, TypeError) as e:
+            # Malformed responses count as failed samples rather than aborting the run
+            sample = new_sample()
+            sample["error"] = type(e).__name__
+        sample["finished_at"] = loop.time()
+        return sample
+
+    measure_cpu = gateway_pid is not None and target in GATEWAY_TARGETS
+    cpu_start = read_cpu_ticks(gateway_pid) if measure_cpu else None
+    t0 = loop.time()
+    tasks = []
+    for offset in schedule:
+        await asyncio.sleep(max(0.0, t0 + offset - loop.time()))
+        tasks.append(asyncio.create_task(timed(offset)))
+    samples = await asyncio.gather(*tasks)
+    cpu_end = read_cpu_ticks(gateway_pid) if measure_cpu else None
+
+    ok = [s for s in samples if s["ok"]]
+    elapsed = max((s["finished_at"] for s in samples), default=loop.time()) - t0
+    items = sum(s["items"] for s in ok)
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s["error"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+
+    cpu_ticks = cpu_per_request = None
+    if cpu_start is not None and cpu_end is not None:
+        cpu_ticks = cpu_end - cpu_start
+        if items:
+            cpu_per_request = round(cpu_ticks / os.sysconf("SC_CLK_TCK") / items * 1000, 3)
+
+    return {
+        "target": target,
+        "offered_rps": scenario["rate"],
+        "duration_s": scenario["duration"],
+        "requests": len(samples),
+        "items": items,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed > 0 else 0.0,
+        "output_tokens_per_sec": round(sum(s["tokens"] for s in ok) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": summarize([s["latency"] for s in ok]),
+        "ttft_ms": summarize([s["ttft"] for s in ok if s["ttft"] is not None]),
+        "gateway_cpu_ms_per_request": cpu_per_request,
+        "gateway_cpu_ticks": cpu_ticks,
+    }
+
+# Regression comparison
+def lookup(result: Dict, path: str) -> Optional[float]:
+    for key in path.split("."):
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+def compare_results(current: Dict, baseline: Dict, threshold_percent: float) -> List[str]:
+    """List metrics that got worse than the baseline by more than threshold_percent"""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if result["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {result['errors']}")
+        # Too few ticks on either side and the CPU delta is measurement noise
+        cpu_ticks = min(result.get("gateway_cpu_ticks") or 0, previous.get("gateway_cpu_ticks") or 0)
+        for path, higher_is_worse in REGRESSION_METRICS:
+            if path == "gateway_cpu_ms_per_request" and cpu_ticks < MIN_CPU_TICKS:
+                continue
+            new, old = lookup(result, path), lookup(previous, path)
+            if new is None or old is None or old == 0:
+                continue
+            change = (new - old) / old * 100
+            if (change if higher_is_worse else -change) > threshold_percent:
+                regressions.append(f"{name}: {path} {old} -> {new} ({change:+.1f}%)")
+    return regressions
+
+def print_report(results: Dict):
+    print(f"\n{'scenario':<20} {'reqs':>6} {'err':>4} {'rps':>7} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'ttft p50':>9} {'tok/s':>8} {'cpu ms':>7}")
+    for name, r in results["scenarios"].items():
+        latency = r["latency_ms"] or {}
+        ttft = r["ttft_ms"] or {}
+        print(f"{name:<20} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>7} "
+              f"{latency.get('p50', '-'):>9} {latency.get('p95', '-'):>9} {latency.get('p99', '-'):>9} "
+              f"{ttft.get('p50', '-'):>9} {r['output_tokens_per_sec']:>8} "
+              f"{r['gateway_cpu_ms_per_request'] if r['gateway_cpu_ms_per_request'] is not None else '-':>7}")
+    print("\nLatency and TTFT in ms; cpu ms = gateway CPU time per request (per item for batches), "
+          f"measured in {1000 / os.sysconf('SC_CLK_TCK'):g} ms clock ticks and only compared "
+          f"when a scenario accumulates at least {MIN_CPU_TICKS} ticks\n")
+
+async def run(args) -> int:
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    scenarios = config["scenarios"]
+    if args.scenario:
+        scenarios = [s for s in scenarios if s["name"] in args.scenario]
+    if args.group:
+        scenarios = [s for s in scenarios if s.get("group") in args.group]
+    if not scenarios:
+        logger.error("No scenarios selected")
+        return 2
+    for scenario in scenarios:
+        scenario["duration"] = scenario["duration"] * args.duration_scale
+
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, "results", f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    processes = []
+    urls = {"gateway": args.gateway_url, "whisper": args.whisper_url, "piper": args.piper_url}
+    gateway_pid = args.gateway_pid
+    if args.mock:
+        log_path = os.path.splitext(output)[0] + ".log"
+        logger.info(f"Starting mock stack, logs in {log_path}")
+        processes, urls, gateway_pid = start_mock_stack(args.config, args.gateway_log_level, log_path)
+
+    try:
+        needed = {"gateway" if s["target"] in GATEWAY_TARGETS else
+                  "whisper" if s["target"] == "transcription" else "piper" for s in scenarios}
+        if args.mock and "gateway" in needed:
+            # The gateway's /health does not check its backends
+            needed.add("vllm")
+        for service in sorted(needed):
+            await wait_healthy(urls[service], timeout=60.0 if args.mock else 10.0)
+
+        headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        rng = random.Random(args.seed)
+        results = {
+            "version": RESULTS_VERSION,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+            "mock": args.mock,
+            "mock_config": config.get("mock") if args.mock else None,
+            "seed": args.seed,
+            "scenarios": {},
+        }
+
+        async with httpx.AsyncClient(timeout=300.0, limits=limits, headers=headers) as client:
+            for scenario in scenarios:
+                logger.info(f"Running {scenario['name']}: {scenario['rate']} req/s for {scenario['duration']}s")
+                results["scenarios"][scenario["name"]] = await run_scenario(client, scenario, urls, rng, gateway_pid)
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(results)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        threshold = args.threshold if args.threshold is not None else \
+            config.get("regression", {}).get("threshold_percent", 10)
+        regressions = compare_results(results, baseline, threshold)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+        logger.info(f"No regressions against {args.compare} (threshold {threshold}%)")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="FamilyAI load test and benchmark")
+    parser.add_argument("--config", default=os.path.join(BENCHMARK_DIR, "scenarios.yaml"), help="Scenario YAML file")
+    parser.add_argument("--mock", action="store_true", help="Start mock backends and a local gateway (no GPUs needed)")
+    parser.add_argument("--scenario", action="append", help="Run only this scenario (repeatable)")
+    parser.add_argument("--group", action="append", help="Run only scenarios in this group (repeatable)")
+    parser.add_argument("--duration-scale", type=float, default=1.0, help="Multiply every scenario duration")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for arrival times")
+    parser.add_argument("--gateway-url", default=os.getenv("GATEWAY_URL", "http://localhost:8080"))
+    parser.add_argument("--whisper-url", default=os.getenv("WHISPER_URL", "http://localhost:8007"))
+    parser.add_argument("--piper-url", default=os.getenv("PIPER_URL", "http://localhost:8008"))
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"))
+    parser.add_argument("--gateway-pid", type=int, help="Gateway process ID for CPU accounting (automatic with --mock)")
+    parser.add_argument("--gateway-log-level", default="info", help="Log level of the gateway started by --mock")
+    parser.add_argument("--output", help="Results JSON path (default: benchmark/results/benchmark-<time>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, help="Regression threshold in percent (default from config)")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+FamilyAI Mock Backends
+OpenAI-compatible stand-ins for vLLM, Whisper and Piper with configurable
+latency and token rate, so the gateway can be benchmarked without GPUs
+"""
+
+import io
+import json
+import time
+import wave
+import signal
+import asyncio
+import logging
+import argparse
+import yaml
+from fastapi import FastAPI, File, UploadFile, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+import uvicorn
+
+from wav import silent_wav
+
+# Configure logging
+logging.basicConfig(
+    level=logging.WARNING,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOCK_CONFIG = {
+    "ttft_ms": 50,
+    "tokens_per_sec": 40,
+    "output_tokens": 64,
+    "embedding_latency_ms": 10,
+    "whisper_latency_ms": 200,
+    "whisper_realtime_factor": 0.1,
+    "piper_latency_ms": 50,
+    "piper_ms_per_char": 2,
+}
+
+def create_vllm_app(config: dict) -> FastAPI:
+    """Mock vLLM OpenAI server: waits ttft, then emits tokens at tokens_per_sec"""
+    app = FastAPI(title="Mock vLLM")
+    token_interval = 1.0 / config["tokens_per_sec"]
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "mock-vllm"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        output_tokens = body.get("max_tokens") or config["output_tokens"]
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+
+        if body.get("stream"):
+            async def generate():
+                await asyncio.sleep(config["ttft_ms"] / 1000)
+                for i in range(output_tokens):
+                    if i:
+                        await asyncio.sleep(token_interval)
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": "tok "}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(generate(), media_type="text/event-stream")
+
+        await asyncio.sleep(config["ttft_ms"] / 1000 + (output_tokens - 1) * token_interval)
+        return JSONResponse(content={
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": created,
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "tok " * output_tokens},
+                "finish_reason": "length",
+            }],
+            "usage": usage,
+        })
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(config["embedding_latency_ms"] / 1000)
+        return {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": [0.0] * 8} for i in range(len(inputs))],
+        }
+
+    return app
+
+def create_whisper_app(config: dict) -> FastAPI:
+    """Mock Whisper service: latency grows with audio duration"""
+    app = FastAPI(title="Mock Whisper ASR")
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "mock-whisper"}
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcribe_audio(file: UploadFile = File(...)):
+        content = await file.read()
+        try:
+            with wave.open(io.BytesIO(content)) as wav:
+                duration = wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError):
+            duration = 0.0
+
+        await asyncio.sleep(config["whisper_latency_ms"] / 1000 + duration * config["whisper_realtime_factor"])
+        return {"text": "mock transcription", "language": "en", "duration": duration, "segments": []}
+
+    return app
+
+def create_piper_app(config: dict) -> FastAPI:
+    """Mock Piper service: latency grows with input length, returns silent WAV"""
+    app = FastAPI(title="Mock Piper TTS")
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "mock-piper"}
+
+    @app.post("/v1/audio/speech")
+    async def create_speech(request: Request):
+        body = await request.json()
+        text = body.get("input", "")
+        await asyncio.sleep((config["piper_latency_ms"] + len(text) * config["piper_ms_per_char"]) / 1000)
+        return Response(content=silent_wav(0.1, 22050), media_type="audio/wav")
+
+    return app
+
+async def serve(config: dict, host: str, vllm_port: int, whisper_port: int, piper_port: int):
+    """Run all three mock servers in one event loop"""
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_vllm_app(config), host=host, port=vllm_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(create_whisper_app(config), host=host, port=whisper_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(create_piper_app(config), host=host, port=piper_port, log_level="warning")),
+    ]
+    # uvicorn's own handlers would only stop one server; stop all of them together
+    loop = asyncio.get_running_loop()
+    for server in servers:
+        server.install_signal_handlers = lambda: None
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [setattr(server, "should_exit", True) for server in servers])
+    await asyncio.gather(*(server.serve() for server in servers))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run mock vLLM, Whisper and Piper servers")
+    parser.add_argument("--config", help="Scenario YAML file; its `mock` section overrides defaults")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--vllm-port", type=int, default=9001)
+    parser.add_argument("--whisper-port", type=int, default=9002)
+    parser.add_argument("--piper-port", type=int, default=9003)
+    args = parser.parse_args()
+
+    config = dict(DEFAULT_MOCK_CONFIG)
+    if args.config:
+        with open(args.config, "r") as f:
+            config.update(yaml.safe_load(f).get("mock", {}))
+
+    asyncio.run(serve(config, args.host, args.vllm_port, args.whisper_port, args.piper_port))
+
+if __name__ == "__main__":
+    main()
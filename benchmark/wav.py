@@ -0,0 +1,17 @@
+"""
+WAV helpers shared by the benchmark harness and the mock backends
+(standard library only, so the harness can run without FastAPI)
+"""
+
+import io
+import wave
+
+def silent_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Generate a mono 16-bit silent WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
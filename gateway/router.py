@@ -5,16 +5,33 @@ Routes requests to the most appropriate model based on task type and context
 """
 
 import os
+import sys
+import json
+import time
+import uuid
+import asyncio
 import logging
+import secrets
+import threading
 import yaml
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import StreamingResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from starlette.datastructures import UploadFile
 import httpx
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 
 # Configure logging
 logging.basicConfig(
@@ -24,7 +41,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Load configuration
-with open("/app/config.yaml", "r") as f:
+with open(os.getenv("CONFIG_PATH", "/app/config.yaml"), "r") as f:
     CONFIG = yaml.safe_load(f)
 
 # Expand environment variables
@@ -47,6 +64,39 @@ limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Tracing
+def setup_tracing(app: FastAPI, config: dict):
+    """Export OpenTelemetry spans to a JSONL file or an OTLP collector"""
+    if not config.get("enabled"):
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "familyai-gateway"}),
+        sampler=ParentBasedTraceIdRatio(config.get("sample_ratio", 1.0))
+    )
+    if config.get("exporter") == "otlp":
+        exporter = OTLPSpanExporter(endpoint=config.get("otlp_endpoint"))
+    else:
+        exporter = ConsoleSpanExporter(
+            out=open(config.get("file_path", "/tmp/gateway-traces.jsonl"), "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    # Server spans extract incoming traceparent; client spans inject it into forwarded requests
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=provider, excluded_urls="health,metrics,admin/profile")
+    HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+    logger.info(f"Tracing enabled ({config.get('exporter', 'file')} exporter)")
+
+setup_tracing(app, CONFIG.get("tracing", {}))
+tracer = trace.get_tracer("familyai.gateway")
+
+async def record_http_event(event_name: str, info: dict):
+    """httpx trace hook: mark connect / send / wait-for-headers / body phases on the client span"""
+    if event_name.endswith((".started", ".complete", ".failed")):
+        trace.get_current_span().add_event(event_name)
+
 # Models
 class Message(BaseModel):
     role: str
@@ -59,7 +109,28 @@ class ChatRequest(BaseModel):
     max_tokens: Optional[int] = None
     stream: Optional[bool] = False
 
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+    encoding_format: Optional[str] = None
+
 # Helper functions
+def inline_schema(model) -> dict:
+    """JSON schema of a model with $defs inlined, so it is valid inside openapi_extra"""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].split("/")[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
 def estimate_tokens(text: str) -> int:
     """Rough token estimation (1 token ≈ 4 chars)"""
     return len(text) // 4
@@ -103,9 +174,40 @@ def select_chat_model(messages: List[Message]) -> str:
     logger.info(f"Routing to chat-fast ({message_tokens} tokens)")
     return "chat_fast"
 
+def resolve_service(chat_request: ChatRequest) -> str:
+    """Map the requested model name to a backend service"""
+    model = chat_request.model.lower()
+
+    if model == "auto":
+        # Auto-select based on content
+        first_message = chat_request.messages[0].content if chat_request.messages else ""
+        if any(keyword in first_message.lower() for keyword in ["code", "function", "class", "bug", "refactor"]):
+            service = select_code_model(chat_request.messages)
+        else:
+            service = select_chat_model(chat_request.messages)
+    elif model in ["code", "code-traditional"]:
+        service = "code_traditional"
+    elif model == "code-agentic":
+        service = "code_agentic"
+    elif model in ["chat", "chat-advanced"]:
+        service = "chat_advanced"
+    elif model == "chat-fast":
+        service = "chat_fast"
+    elif model == "chat-light":
+        service = "chat_light"
+    elif model == "vision":
+        service = "vision"
+    else:
+        service = select_chat_model(chat_request.messages)
+
+    return service
+
 def get_backend_url(service: str) -> str:
     """Get backend service URL"""
-    return CONFIG["backends"][service]["url"]
+    url = CONFIG["backends"].get(service, {}).get("url")
+    if not url or url.startswith("${"):
+        raise HTTPException(status_code=503, detail=f"Backend service '{service}' is not configured")
+    return url
 
 # Authentication
 async def verify_api_key(request: Request):
@@ -118,6 +220,17 @@ async def verify_api_key(request: Request):
         raise HTTPException(status_code=401, detail="Invalid API key")
     return True
 
+async def verify_admin_key(request: Request):
+    """Admin endpoints require ADMIN_API_KEY and are disabled without it"""
+    admin_key = CONFIG.get("admin", {}).get("api_key")
+    if not admin_key or admin_key.startswith("${"):
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+
+    api_key = request.headers.get("Authorization", "").replace("Bearer ", "")
+    if not secrets.compare_digest(api_key.encode(), admin_key.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+    return True
+
 # Routes
 @app.get("/health")
 async def health_check():
@@ -138,63 +251,367 @@ async def list_models(auth: bool = Depends(verify_api_key)):
     ]
     return {"object": "list", "data": models}
 
-@app.post("/v1/chat/completions")
+@app.post(
+    "/v1/chat/completions",
+    # Body is parsed in the handler; keep the schema in /docs and generated clients
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": inline_schema(ChatRequest)}}
+    }}
+)
 @limiter.limit(f"{CONFIG['rate_limit']['requests_per_minute']}/minute")
 async def chat_completions(
     request: Request,
-    chat_request: ChatRequest,
     auth: bool = Depends(verify_api_key)
 ):
     """Handle chat completion requests with intelligent routing"""
 
-    # Determine backend service
-    model = chat_request.model.lower()
+    # Parsed here rather than by FastAPI so the time shows up as its own span;
+    # errors keep FastAPI's 422 format
+    with tracer.start_as_current_span("gateway.parse_request"):
+        try:
+            body = json.loads(await request.body())
+        except json.JSONDecodeError as e:
+            raise RequestValidationError([{
+                "type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                "input": {}, "ctx": {"error": e.msg}
+            }])
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="There was an error parsing the body")
+        try:
+            chat_request = ChatRequest.model_validate(body)
+        except ValidationError as e:
+            raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
 
-    if model == "auto":
-        # Auto-select based on content
-        first_message = chat_request.messages[0].content if chat_request.messages else ""
-        if any(keyword in first_message.lower() for keyword in ["code", "function", "class", "bug", "refactor"]):
-            service = select_code_model(chat_request.messages)
-        else:
-            service = select_chat_model(chat_request.messages)
-    elif model in ["code", "code-traditional"]:
-        service = "code_traditional"
-    elif model == "code-agentic":
-        service = "code_agentic"
-    elif model in ["chat", "chat-advanced"]:
-        service = "chat_advanced"
-    elif model == "chat-fast":
-        service = "chat_fast"
-    elif model == "chat-light":
-        service = "chat_light"
-    elif model == "vision":
-        service = "vision"
-    else:
-        service = select_chat_model(chat_request.messages)
+    # Determine backend service
+    with tracer.start_as_current_span("gateway.route") as span:
+        service = resolve_service(chat_request)
+        backend_url = get_backend_url(service)
+        span.set_attribute("familyai.model", chat_request.model)
+        span.set_attribute("familyai.service", service)
 
-    backend_url = get_backend_url(service)
+    with tracer.start_as_current_span("gateway.serialize_request"):
+        payload = chat_request.dict()
 
     # Forward request to backend
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        try:
-            response = await client.post(
+    try:
+        # The httpx client span ends once headers arrive; body events land on this span
+        with tracer.start_as_current_span("gateway.upstream"):
+            response = await http_client.post(
                 f"{backend_url}/v1/chat/completions",
-                json=chat_request.dict(),
-                headers={"Content-Type": "application/json"}
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                extensions={"trace": record_http_event}
             )
-            response.raise_for_status()
-
-            if chat_request.stream:
-                async def generate():
-                    async for chunk in response.aiter_bytes():
-                        yield chunk
-                return StreamingResponse(generate(), media_type="text/event-stream")
-            else:
-                return JSONResponse(content=response.json())
-
-        except httpx.HTTPError as e:
-            logger.error(f"Backend error: {e}")
-            raise HTTPException(status_code=502, detail=f"Backend service error: {str(e)}")
+        response.raise_for_status()
+
+        if chat_request.stream:
+            async def generate():
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+            return StreamingResponse(generate(), media_type="text/event-stream")
+        else:
+            return JSONResponse(content=response.json())
+
+    except httpx.HTTPError as e:
+        logger.error(f"Backend error: {e}")
+        raise HTTPException(status_code=502, detail=f"Backend service error: {str(e)}")
+
+@app.post("/v1/embeddings")
+@limiter.limit(f"{CONFIG['rate_limit']['requests_per_minute']}/minute")
+async def embeddings(
+    request: Request,
+    embedding_request: EmbeddingRequest,
+    auth: bool = Depends(verify_api_key)
+):
+    """Forward embedding requests to the embeddings backend"""
+    backend_url = get_backend_url("embeddings")
+
+    try:
+        response = await http_client.post(
+            f"{backend_url}/v1/embeddings",
+            json=embedding_request.dict(exclude_none=True)
+        )
+        response.raise_for_status()
+        return JSONResponse(content=response.json())
+    except httpx.HTTPError as e:
+        logger.error(f"Backend error: {e}")
+        raise HTTPException(status_code=502, detail=f"Backend service error: {str(e)}")
+
+# Batch processing
+BATCH_CONFIG = CONFIG.get("batch", {})
+BATCH_URLS = ["/v1/chat/completions", "/v1/embeddings"]
+BATCH_JOBS: Dict[str, "BatchJob"] = {}
+BACKEND_SEMAPHORES: Dict[str, asyncio.Semaphore] = {}
+
+class BatchJob:
+    """In-memory batch job; results are retained so clients can resume streaming"""
+
+    def __init__(self, total: int):
+        self.id = f"batch_{uuid.uuid4().hex}"
+        self.total = total
+        self.results: List[Dict[str, Any]] = []
+        self.created_at = int(time.time())
+        self.completed_at: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def add_result(self, result: Dict[str, Any]):
+        """Record a finished item and wake up any streaming readers"""
+        self.results.append(result)
+        if len(self.results) >= self.total:
+            self.completed_at = int(time.time())
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def stream(self, offset: int = 0):
+        """Yield NDJSON result lines from offset, waiting for new ones until the job completes"""
+        while True:
+            changed = self._changed
+            while offset < len(self.results):
+                yield json.dumps(self.results[offset]) + "\n"
+                offset += 1
+            if self.completed_at is not None:
+                return
+            await changed.wait()
+
+    def status(self) -> Dict[str, Any]:
+        """OpenAI-style batch status object"""
+        failed = sum(1 for result in self.results if result["error"] is not None)
+        return {
+            "id": self.id,
+            "object": "batch",
+            "status": "completed" if self.completed_at is not None else "in_progress",
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "request_counts": {
+                "total": self.total,
+                "completed": len(self.results) - failed,
+                "failed": failed,
+            },
+        }
+
+def parse_batch_payload(raw: str, content_type: str) -> List[Dict[str, Any]]:
+    """Parse a batch given as a JSON array, {"requests": [...]} or JSONL"""
+    try:
+        if content_type.startswith("application/json"):
+            data = json.loads(raw)
+            items = data.get("requests") if isinstance(data, dict) else data
+        else:
+            items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch payload: {str(e)}")
+
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one request")
+    if not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="Each batch request must be a JSON object")
+    if len(items) > BATCH_CONFIG.get("max_requests", 10000):
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_CONFIG.get('max_requests', 10000)} requests")
+    return items
+
+def get_backend_semaphore(service: str) -> asyncio.Semaphore:
+    """Per-backend concurrency limit shared by all running batch jobs"""
+    if service not in BACKEND_SEMAPHORES:
+        limit = BATCH_CONFIG.get("concurrency", {}).get(service, BATCH_CONFIG.get("default_concurrency", 8))
+        BACKEND_SEMAPHORES[service] = asyncio.Semaphore(limit)
+    return BACKEND_SEMAPHORES[service]
+
+def purge_expired_jobs():
+    """Drop completed jobs older than the configured TTL"""
+    cutoff = time.time() - BATCH_CONFIG.get("job_ttl_seconds", 3600)
+    for job_id, job in list(BATCH_JOBS.items()):
+        if job.completed_at is not None and job.completed_at < cutoff:
+            del BATCH_JOBS[job_id]
+
+async def process_batch_item(job: BatchJob, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Route and execute a single batch item, returning an OpenAI-style output line"""
+    result = {"id": f"{job.id}-{index}", "custom_id": item.get("custom_id", str(index)), "response": None, "error": None}
+    url = item.get("url", "/v1/chat/completions")
+    body = item.get("body", item)
+
+    try:
+        if url == "/v1/chat/completions":
+            chat_request = ChatRequest(**body)
+            service = resolve_service(chat_request)
+            payload = chat_request.dict()
+            payload["stream"] = False
+        elif url == "/v1/embeddings":
+            service = "embeddings"
+            payload = EmbeddingRequest(**body).dict(exclude_none=True)
+        else:
+            raise ValueError(f"Unsupported url '{url}', expected one of {BATCH_URLS}")
+        backend_url = get_backend_url(service)
+
+        with tracer.start_as_current_span("gateway.batch_item") as span:
+            span.set_attribute("familyai.batch_id", job.id)
+            span.set_attribute("familyai.service", service)
+            async with get_backend_semaphore(service):
+                response = await http_client.post(
+                    f"{backend_url}{url}", json=payload, extensions={"trace": record_http_event}
+                )
+
+        try:
+            response_body = response.json()
+        except ValueError:
+            response_body = response.text
+        result["response"] = {"status_code": response.status_code, "body": response_body}
+    except HTTPException as e:
+        result["error"] = {"code": "backend_unavailable", "message": e.detail}
+    except (ValueError, TypeError) as e:
+        result["error"] = {"code": "invalid_request", "message": str(e)}
+    except httpx.HTTPError as e:
+        logger.error(f"Batch {job.id} item {index} backend error: {e}")
+        result["error"] = {"code": "backend_error", "message": str(e)}
+
+    return result
+
+async def run_batch(job: BatchJob, items: List[Dict[str, Any]]):
+    """Fan out all items concurrently; results are recorded in completion order"""
+    async def run_item(index: int, item: Dict[str, Any]):
+        # Every item must produce exactly one result, or readers would wait forever
+        try:
+            result = await process_batch_item(job, index, item)
+        except Exception as e:
+            logger.exception(f"Batch {job.id} item {index} failed: {e}")
+            result = {
+                "id": f"{job.id}-{index}",
+                "custom_id": item.get("custom_id", str(index)),
+                "response": None,
+                "error": {"code": "internal_error", "message": str(e)},
+            }
+        job.add_result(result)
+
+    await asyncio.gather(*(run_item(index, item) for index, item in enumerate(items)))
+    logger.info(f"Batch {job.id} completed: {job.status()['request_counts']}")
+
+@app.post("/v1/batches")
+@limiter.limit(f"{CONFIG['rate_limit']['requests_per_minute']}/minute")
+async def create_batch(request: Request, auth: bool = Depends(verify_api_key)):
+    """
+    Submit a batch of chat completion / embedding requests
+
+    Accepts a JSON array, {"requests": [...]}, a JSONL body or a multipart
+    upload with a `file` field. Results stream back as NDJSON in completion
+    order; the X-Batch-ID header can be used to resume via
+    /v1/batches/{id}/results?offset=N after a disconnect.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        # A plain-text form field (curl -F file=value) arrives as str, not an upload
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="Missing 'file' upload")
+        raw = await upload.read()
+        content_type = upload.content_type or ""
+    else:
+        raw = await request.body()
+
+    try:
+        items = parse_batch_payload(raw.decode("utf-8"), content_type)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Batch payload must be UTF-8")
+
+    purge_expired_jobs()
+    job = BatchJob(total=len(items))
+    BATCH_JOBS[job.id] = job
+    # Run detached from the request so the job survives client disconnects
+    job.task = asyncio.create_task(run_batch(job, items))
+    logger.info(f"Batch {job.id} created with {job.total} requests")
+
+    return StreamingResponse(
+        job.stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-ID": job.id}
+    )
+
+def get_batch_job(batch_id: str) -> BatchJob:
+    """Look up a batch job or raise 404"""
+    job = BATCH_JOBS.get(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    return job
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str, auth: bool = Depends(verify_api_key)):
+    """Get batch job status"""
+    return get_batch_job(batch_id).status()
+
+@app.get("/v1/batches/{batch_id}/results")
+async def get_batch_results(batch_id: str, offset: int = 0, auth: bool = Depends(verify_api_key)):
+    """Stream batch results as NDJSON, starting after the first `offset` lines"""
+    job = get_batch_job(batch_id)
+    return StreamingResponse(
+        job.stream(max(offset, 0)),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-ID": job.id}
+    )
+
+# Shared HTTP client (connection pooling for chat, embeddings and batch fan-out)
+http_client: Optional[httpx.AsyncClient] = None
+
+@app.on_event("startup")
+async def create_http_client():
+    """Create the pooled HTTP client"""
+    global http_client
+    http_client = httpx.AsyncClient(timeout=300.0, limits=httpx.Limits(max_connections=None))
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close the pooled HTTP client"""
+    if http_client is not None:
+        await http_client.aclose()
+
+# Profiling
+PROFILER_CONFIG = CONFIG.get("profiler", {})
+profile_lock = asyncio.Lock()
+
+def sample_stacks(seconds: float, hz: int) -> Dict[str, int]:
+    """Sample the Python stacks of all other threads; returns folded stack -> count"""
+    counts: Dict[str, int] = {}
+    sampler_id = threading.get_ident()
+    interval = 1.0 / hz
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            key = ";".join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+        time.sleep(interval)
+
+    return counts
+
+@app.get("/admin/profile")
+async def profile(seconds: float = 10.0, hz: int = 100, auth: bool = Depends(verify_admin_key)):
+    """
+    Sample the running gateway and return folded stacks
+
+    The output ("frame;frame;frame count" per line) can be fed to
+    flamegraph.pl or opened in speedscope.
+    """
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    seconds = min(max(seconds, 0.1), PROFILER_CONFIG.get("max_seconds", 60))
+    hz = min(max(hz, 1), PROFILER_CONFIG.get("max_hz", 1000))
+    async with profile_lock:
+        logger.info(f"Profiling for {seconds}s at {hz} Hz")
+        counts = await asyncio.to_thread(sample_stacks, seconds, hz)
+
+    folded = "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+    return PlainTextResponse(
+        folded,
+        headers={"Content-Disposition": 'attachment; filename="gateway-profile.folded"'}
+    )
 
 @app.get("/metrics")
 async def metrics():
@@ -14,6 +14,13 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 import uvicorn
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +36,30 @@ with open("/app/config.yaml", "r") as f:
 # Initialize FastAPI app
 app = FastAPI(title="FamilyAI Piper TTS", version="1.0.0")
 
+# Tracing
+def setup_tracing(app: FastAPI, config: dict):
+    """Export OpenTelemetry spans (JSONL file or OTLP collector) if enabled"""
+    if not config.get("enabled"):
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "familyai-piper"}),
+        sampler=ParentBasedTraceIdRatio(config.get("sample_ratio", 1.0))
+    )
+    if config.get("exporter") == "otlp":
+        exporter = OTLPSpanExporter(endpoint=config.get("otlp_endpoint"))
+    else:
+        exporter = ConsoleSpanExporter(
+            out=open(config.get("file_path", "/tmp/piper-traces.jsonl"), "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    # Continues traces from an incoming traceparent header
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="health")
+
+setup_tracing(app, CONFIG.get("tracing", {}))
+
 # Piper TTS will be initialized on first use
 piper_model = None
 
@@ -0,0 +1,92 @@
+"""
+Tests for the FamilyAI benchmark harness
+"""
+
+import os
+import sys
+import random
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark"))
+
+def test_percentile_interpolates():
+    """Test percentiles match numpy's linear interpolation"""
+    from benchmark import percentile
+
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(values, 50) == 2.5
+    assert percentile(values, 100) == 4.0
+    assert percentile([], 50) is None
+
+def test_arrival_times_open_loop():
+    """Test arrival schedules are reproducible and bounded by duration"""
+    from benchmark import arrival_times
+
+    constant = arrival_times(2, 5, "constant", random.Random(0))
+    assert constant == pytest.approx([0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5])
+
+    poisson = arrival_times(10, 30, "poisson", random.Random(42))
+    assert poisson == arrival_times(10, 30, "poisson", random.Random(42))
+    assert all(t < 30 for t in poisson)
+    assert 200 < len(poisson) < 400
+
+def test_compare_results_flags_regressions():
+    """Test slower latency and lower throughput are reported beyond the threshold"""
+    from benchmark import compare_results
+
+    baseline = {"scenarios": {"chat": {
+        "errors": 0, "latency_ms": {"p50": 100, "p95": 200, "p99": 300},
+        "ttft_ms": None, "throughput_rps": 10.0, "gateway_cpu_ms_per_request": 2.0,
+    }}}
+    current = {"scenarios": {"chat": {
+        "errors": 0, "latency_ms": {"p50": 105, "p95": 260, "p99": 310},
+        "ttft_ms": None, "throughput_rps": 8.0, "gateway_cpu_ms_per_request": 2.0,
+    }}}
+
+    regressions = compare_results(current, baseline, threshold_percent=10)
+    assert len(regressions) == 2
+    assert any("latency_ms.p95" in r for r in regressions)
+    assert any("throughput_rps" in r for r in regressions)
+    assert compare_results(baseline, baseline, threshold_percent=10) == []
+
+def test_compare_results_skips_coarse_cpu_samples():
+    """Test gateway CPU is only compared when both runs have enough clock ticks"""
+    from benchmark import compare_results, MIN_CPU_TICKS
+
+    def result(cpu_ms, ticks):
+        return {"scenarios": {"chat": {
+            "errors": 0, "latency_ms": None, "ttft_ms": None, "throughput_rps": 10.0,
+            "gateway_cpu_ms_per_request": cpu_ms, "gateway_cpu_ticks": ticks,
+        }}}
+
+    assert compare_results(result(40.0, 12), result(33.333, 10), threshold_percent=10) == []
+    assert compare_results(result(40.0, 12), result(33.333, None), threshold_percent=10) == []
+    regressions = compare_results(result(40.0, MIN_CPU_TICKS * 2), result(33.333, MIN_CPU_TICKS), threshold_percent=10)
+    assert len(regressions) == 1
+    assert "gateway_cpu_ms_per_request" in regressions[0]
+
+def test_run_scenario_counts_malformed_responses():
+    """Test non-JSON replies become per-sample errors instead of aborting the run"""
+    import asyncio
+    import json
+    import httpx
+    from benchmark import run_scenario
+
+    def handler(request):
+        if request.url.path == "/v1/batches":
+            line = {"custom_id": "0", "error": None, "response": {"status_code": 200, "body": "not json"}}
+            return httpx.Response(200, text=json.dumps(line) + "\n")
+        return httpx.Response(200, text="not json")
+
+    async def run(target):
+        scenario = {"target": target, "rate": 20, "duration": 0.2, "arrival": "constant", "batch_size": 1}
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await run_scenario(client, scenario, {"gateway": "http://gateway"}, random.Random(0), None)
+
+    for target in ["chat", "batch"]:
+        result = asyncio.run(run(target))
+        assert result["requests"] == 3
+        assert result["errors"] == 3
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
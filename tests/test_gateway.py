@@ -46,6 +46,298 @@ def test_select_chat_model_advanced():
     model = select_chat_model(messages)
     assert model == "chat_advanced"
 
+def test_resolve_service_explicit_model():
+    """Test explicit model names map to their backend"""
+    from gateway.router import resolve_service
+    from gateway.router import ChatRequest
+
+    chat_request = ChatRequest(model="Chat-Fast", messages=[{"role": "user", "content": "Hi"}])
+    assert resolve_service(chat_request) == "chat_fast"
+
+def test_parse_batch_payload_formats():
+    """Test batch payloads are accepted as JSON array, wrapped object and JSONL"""
+    from gateway.router import parse_batch_payload
+
+    item = '{"custom_id": "1", "body": {"model": "auto", "messages": []}}'
+    assert len(parse_batch_payload(f"[{item}, {item}]", "application/json")) == 2
+    assert len(parse_batch_payload(f'{{"requests": [{item}]}}', "application/json")) == 1
+    assert len(parse_batch_payload(f"{item}\n\n{item}\n", "application/x-ndjson")) == 2
+
+def test_parse_batch_payload_invalid():
+    """Test malformed or empty batches are rejected"""
+    from fastapi import HTTPException
+    from gateway.router import parse_batch_payload
+
+    with pytest.raises(HTTPException):
+        parse_batch_payload("not json", "application/x-ndjson")
+    with pytest.raises(HTTPException):
+        parse_batch_payload("[]", "application/json")
+
+# Batch fan-out against a mocked backend
+def batch_items(delays):
+    """One chat-light item per delay; the mock backend sleeps `delay` seconds for it"""
+    return [
+        {"custom_id": f"item-{i}", "body": {"model": "chat-light", "messages": [{"role": "user", "content": str(delay)}]}}
+        for i, delay in enumerate(delays)
+    ]
+
+def mock_backend(stats):
+    """httpx client whose backend echoes the prompt and tracks in-flight requests"""
+    import asyncio
+    import json
+    import httpx
+
+    async def handler(request):
+        delay = float(json.loads(request.content)["messages"][0]["content"])
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        await asyncio.sleep(delay)
+        stats["in_flight"] -= 1
+        return httpx.Response(200, json={"choices": [], "usage": {"completion_tokens": 1}})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def batch_patches(concurrency):
+    """Point chat_light at the mock backend with a fresh per-backend limit"""
+    from contextlib import ExitStack
+    import gateway.router as router
+
+    stack = ExitStack()
+    stack.enter_context(patch.dict(router.CONFIG["backends"], {"chat_light": {"url": "http://backend"}}))
+    stack.enter_context(patch.dict(router.BATCH_CONFIG, {"concurrency": {"chat_light": concurrency}}))
+    stack.enter_context(patch.dict(router.BACKEND_SEMAPHORES, clear=True))
+    stack.enter_context(patch.dict(router.CONFIG["auth"], {"enabled": False}))
+    return stack
+
+def run_job(items, stats, concurrency=8):
+    """Run a batch to completion and return (job, streamed lines)"""
+    import asyncio
+    import json
+    import gateway.router as router
+
+    async def run():
+        job = router.BatchJob(total=len(items))
+        await router.run_batch(job, items)
+        lines = [line async for line in job.stream()]
+        return job, [json.loads(line) for line in lines]
+
+    with batch_patches(concurrency), patch.object(router, "http_client", mock_backend(stats)):
+        return asyncio.run(run())
+
+def test_run_batch_streams_in_completion_order():
+    """Test results are emitted as items finish, not in submission order"""
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    job, results = run_job(batch_items([0.15, 0.1, 0.05, 0.0]), stats)
+
+    assert [r["custom_id"] for r in results] == ["item-3", "item-2", "item-1", "item-0"]
+    assert all(r["response"]["status_code"] == 200 for r in results)
+    assert stats["max_in_flight"] == 4
+
+def test_run_batch_semaphore_serializes_backend():
+    """Test a per-backend limit of 1 allows only one in-flight request"""
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    job, results = run_job(batch_items([0.05, 0.0, 0.02]), stats, concurrency=1)
+
+    assert stats["max_in_flight"] == 1
+    assert len(results) == 3
+
+def test_batch_job_status_and_resume_offset():
+    """Test status counts and that stream(offset) skips already-delivered lines"""
+    import asyncio
+    import json
+
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    items = batch_items([0.0, 0.01]) + [{"custom_id": "bad", "url": "/v1/unknown", "body": {}}]
+    job, results = run_job(items, stats)
+
+    status = job.status()
+    assert status["status"] == "completed"
+    assert status["request_counts"] == {"total": 3, "completed": 2, "failed": 1}
+
+    async def resume():
+        return [json.loads(line) async for line in job.stream(offset=1)]
+    assert asyncio.run(resume()) == results[1:]
+
+def test_run_batch_unexpected_error_completes_job():
+    """Test an exception outside the handled types still yields a result line"""
+    from unittest.mock import AsyncMock
+    import gateway.router as router
+
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    failure = AsyncMock(side_effect=RuntimeError("boom"))
+    with patch.object(router, "process_batch_item", failure):
+        job, results = run_job(batch_items([0.0, 0.0]), stats)
+
+    assert job.status()["status"] == "completed"
+    assert [r["custom_id"] for r in results] == ["item-0", "item-1"]
+    assert [r["error"]["code"] for r in results] == ["internal_error", "internal_error"]
+
+def test_batch_endpoint_header_and_resume():
+    """Test POST /v1/batches returns X-Batch-ID and results can be re-read by offset"""
+    import json
+    from fastapi.testclient import TestClient
+    import gateway.router as router
+
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    body = "\n".join(json.dumps(item) for item in batch_items([0.02, 0.0]))
+
+    with batch_patches(8), patch.object(router, "http_client", mock_backend(stats)):
+        client = TestClient(router.app)
+        response = client.post("/v1/batches", content=body, headers={"Content-Type": "application/x-ndjson"})
+        batch_id = response.headers["X-Batch-ID"]
+        lines = response.text.splitlines()
+
+        resumed = client.get(f"/v1/batches/{batch_id}/results?offset=1")
+        status = client.get(f"/v1/batches/{batch_id}").json()
+
+    assert response.status_code == 200
+    assert [json.loads(line)["custom_id"] for line in lines] == ["item-1", "item-0"]
+    assert resumed.text.splitlines() == lines[1:]
+    assert status["request_counts"]["completed"] == 2
+
+def test_batch_endpoint_rejects_text_file_field():
+    """Test a multipart `file` field sent as plain text is a 400, not a server error"""
+    from fastapi.testclient import TestClient
+    import gateway.router as router
+
+    with patch.dict(router.CONFIG["auth"], {"enabled": False}):
+        response = TestClient(router.app).post("/v1/batches", data={"file": "notafile"}, files={"other": ("x", b"")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing 'file' upload"
+
+def test_get_backend_url_unconfigured():
+    """Test a backend whose URL variable is unset returns 503"""
+    from fastapi import HTTPException
+    from gateway.router import get_backend_url, CONFIG
+
+    with patch.dict(CONFIG["backends"], {"embeddings": {"url": "${EMBEDDINGS_URL}"}}):
+        with pytest.raises(HTTPException) as exc_info:
+            get_backend_url("embeddings")
+    assert exc_info.value.status_code == 503
+
+def test_sample_stacks_folded_format():
+    """Test the profiler returns folded stacks that include busy threads"""
+    import threading
+    from gateway.router import sample_stacks
+
+    stop = threading.Event()
+    def busy_worker():
+        while not stop.is_set():
+            pass
+
+    worker = threading.Thread(target=busy_worker, name="busy")
+    worker.start()
+    try:
+        counts = sample_stacks(0.2, 100)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert any(stack.startswith("busy;") and "busy_worker" in stack for stack in counts)
+    assert all(count > 0 for count in counts.values())
+
+def test_admin_profile_disabled_without_key():
+    """Test the profiler endpoint is unavailable when no admin key is configured"""
+    from fastapi.testclient import TestClient
+    from gateway.router import app, CONFIG
+
+    with patch.dict(CONFIG, {"admin": {"api_key": ""}}):
+        response = TestClient(app).get("/admin/profile?seconds=0.1")
+    assert response.status_code == 403
+
+def test_admin_profile_rejects_non_ascii_key():
+    """Test a non-ASCII Authorization header is a 401, not a server error"""
+    from fastapi.testclient import TestClient
+    from gateway.router import app, CONFIG
+
+    with patch.dict(CONFIG, {"admin": {"api_key": "secret"}}):
+        response = TestClient(app).get(
+            "/admin/profile?seconds=0.1",
+            headers={"Authorization": "Bearer sécret".encode("utf-8")}
+        )
+    assert response.status_code == 401
+
+def test_chat_completions_openapi_schema():
+    """Test the chat request body stays documented although the handler parses it"""
+    from fastapi.testclient import TestClient
+    from gateway.router import app
+
+    operation = TestClient(app).get("/openapi.json").json()["paths"]["/v1/chat/completions"]["post"]
+    schema = operation["requestBody"]["content"]["application/json"]["schema"]
+    assert operation["requestBody"]["required"] is True
+    assert set(schema["required"]) == {"model", "messages"}
+    assert "$ref" not in str(schema)
+    assert schema["properties"]["messages"]["items"]["properties"]["role"]["type"] == "string"
+
+def test_chat_completions_validation_errors_match_fastapi():
+    """Test 422 bodies keep FastAPI's body-prefixed format for missing fields and invalid JSON"""
+    from fastapi.testclient import TestClient
+    from gateway.router import app, CONFIG
+
+    with patch.dict(CONFIG["auth"], {"enabled": False}):
+        client = TestClient(app)
+        missing = client.post("/v1/chat/completions", json={"model": "auto"})
+        invalid = client.post("/v1/chat/completions", content="{bad", headers={"Content-Type": "application/json"})
+        embeddings = client.post("/v1/embeddings", json={"input": "hi"})
+
+    assert missing.status_code == 422
+    assert [(e["type"], e["loc"]) for e in missing.json()["detail"]] == [("missing", ["body", "messages"])]
+    assert embeddings.json()["detail"][0]["loc"] == ["body", "model"]
+    assert invalid.status_code == 422
+    assert invalid.json()["detail"] == [{
+        "type": "json_invalid", "loc": ["body", 1], "msg": "JSON decode error",
+        "input": {}, "ctx": {"error": "Expecting property name enclosed in double quotes"}
+    }]
+
+def test_chat_completions_tracing_propagates_traceparent(tmp_path):
+    """Test gateway spans share the caller's trace and the backend receives its traceparent"""
+    import httpx
+    from fastapi.testclient import TestClient
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    import gateway.router as router
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    backend_headers = []
+
+    def handler(request):
+        backend_headers.append(request.headers)
+        return httpx.Response(200, json={"choices": [], "usage": {"completion_tokens": 1}})
+
+    exporter = InMemorySpanExporter()
+    config = {"enabled": True, "exporter": "file", "file_path": str(tmp_path / "traces.jsonl")}
+    # The global tracer provider can only be set once per process, so keep it local
+    with patch.object(router, "ConsoleSpanExporter", return_value=exporter), \
+            patch.object(router, "BatchSpanProcessor", SimpleSpanProcessor), \
+            patch.object(router.trace, "set_tracer_provider") as set_provider, \
+            patch.dict(router.CONFIG["backends"], {"chat_light": {"url": "http://backend"}}), \
+            patch.dict(router.CONFIG["auth"], {"enabled": False}):
+        router.app.middleware_stack = None
+        router.setup_tracing(router.app, config)
+        provider = set_provider.call_args.args[0]
+        try:
+            with patch.object(router, "tracer", provider.get_tracer("familyai.gateway")), \
+                    patch.object(router, "http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+                response = TestClient(router.app).post(
+                    "/v1/chat/completions",
+                    json={"model": "chat-light", "messages": [{"role": "user", "content": "Hi"}]},
+                    headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+                )
+        finally:
+            FastAPIInstrumentor.uninstrument_app(router.app)
+            HTTPXClientInstrumentor().uninstrument()
+
+    assert response.status_code == 200
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    for name in ["POST /v1/chat/completions", "gateway.parse_request", "gateway.route",
+                 "gateway.serialize_request", "gateway.upstream", "POST"]:
+        assert format(spans[name].context.trace_id, "032x") == trace_id
+    assert spans["gateway.route"].attributes["familyai.service"] == "chat_light"
+    assert spans["POST"].parent.span_id == spans["gateway.upstream"].context.span_id
+    assert backend_headers[0]["traceparent"].split("-")[1] == trace_id
+
 @pytest.mark.integration
 def test_gateway_health_endpoint():
     """Test gateway health endpoint"""
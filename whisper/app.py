@@ -13,6 +13,13 @@ from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
 import uvicorn
 from faster_whisper import WhisperModel
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +35,31 @@ with open("/app/config.yaml", "r") as f:
 # Initialize FastAPI app
 app = FastAPI(title="FamilyAI Whisper ASR", version="1.0.0")
 
+# Tracing
+def setup_tracing(app: FastAPI, config: dict):
+    """Export OpenTelemetry spans (JSONL file or OTLP collector) if enabled"""
+    if not config.get("enabled"):
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "familyai-whisper"}),
+        sampler=ParentBasedTraceIdRatio(config.get("sample_ratio", 1.0))
+    )
+    if config.get("exporter") == "otlp":
+        exporter = OTLPSpanExporter(endpoint=config.get("otlp_endpoint"))
+    else:
+        exporter = ConsoleSpanExporter(
+            out=open(config.get("file_path", "/tmp/whisper-traces.jsonl"), "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    # Continues traces from an incoming traceparent header
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="health")
+
+setup_tracing(app, CONFIG.get("tracing", {}))
+tracer = trace.get_tracer("familyai.whisper")
+
 # Global model variable
 model = None
 
@@ -80,37 +112,43 @@ async def transcribe_audio(
 
     # Save uploaded file temporarily
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        with tracer.start_as_current_span("whisper.save_upload") as span:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as tmp_file:
+                content = await file.read()
+                tmp_file.write(content)
+                tmp_file_path = tmp_file.name
+            span.set_attribute("familyai.audio_bytes", len(content))
 
         logger.info(f"Transcribing audio file: {file.filename}")
 
-        # Perform transcription
-        segments, info = model.transcribe(
-            tmp_file_path,
-            language=language or CONFIG['language']['default'],
-            task=task or CONFIG['language']['task'],
-            beam_size=CONFIG['performance']['beam_size'],
-            best_of=CONFIG['performance']['best_of'],
-            temperature=temperature if temperature is not None else CONFIG['performance']['temperature'],
-            vad_filter=CONFIG['performance']['vad_filter']
-        )
-
-        # Collect all segments
+        # Perform transcription (feature extraction and language detection)
+        with tracer.start_as_current_span("whisper.prepare"):
+            segments, info = model.transcribe(
+                tmp_file_path,
+                language=language or CONFIG['language']['default'],
+                task=task or CONFIG['language']['task'],
+                beam_size=CONFIG['performance']['beam_size'],
+                best_of=CONFIG['performance']['best_of'],
+                temperature=temperature if temperature is not None else CONFIG['performance']['temperature'],
+                vad_filter=CONFIG['performance']['vad_filter']
+            )
+
+        # Collect all segments; decoding happens lazily while iterating
         full_text = ""
         segments_list = []
 
-        for segment in segments:
-            full_text += segment.text
-            segments_list.append({
-                "id": segment.id,
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text,
-                "confidence": segment.avg_logprob
-            })
+        with tracer.start_as_current_span("whisper.decode") as span:
+            for segment in segments:
+                full_text += segment.text
+                segments_list.append({
+                    "id": segment.id,
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": segment.text,
+                    "confidence": segment.avg_logprob
+                })
+            span.set_attribute("familyai.audio_seconds", info.duration)
+            span.set_attribute("familyai.segments", len(segments_list))
 
         # Clean up temp file
         os.unlink(tmp_file_path)